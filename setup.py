@@ -0,0 +1,12 @@
+# Builds the optional Cython extension for the chunking inner loop:
+#   pip install cython
+#   python setup.py build_ext --inplace
+# The pipeline runs fine without it; chunker falls back to pure Python.
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="policybot-ext",
+    ext_modules=cythonize(["src/_chunker.pyx"]),
+)
@@ -0,0 +1,29 @@
+# cython: language_level=3
+# Cython build of the chunk-assembly inner loop. chunker.chunk_text uses this
+# when the extension has been compiled (python setup.py build_ext --inplace)
+# and falls back to the pure-Python loop otherwise. Keep the two in sync.
+
+def chunk_text_c(list sentences, int max_words):
+    cdef list chunks = []
+    cdef list current_chunk = []
+    cdef int current_len = 0
+    cdef int word_count
+    cdef Py_ssize_t i, n = len(sentences)
+    cdef str sentence
+
+    for i in range(n):
+        sentence = <str>sentences[i]
+        word_count = sentence.count(" ") + 1
+        if current_len + word_count > max_words:
+            if current_chunk:
+                chunks.append(" ".join(current_chunk))
+            current_chunk = [sentence]
+            current_len = word_count
+        else:
+            current_chunk.append(sentence)
+            current_len += word_count
+
+    if current_chunk:
+        chunks.append(" ".join(current_chunk))
+
+    return chunks
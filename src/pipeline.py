@@ -34,7 +34,7 @@ logging.basicConfig(
 # ----------------------------
 ALREADY_DOWNLOADED_PATH = "data/raw/already_downloaded.yaml"
 ALREADY_EMBEDDED_PATH = "data/vector_db/already_embedded.yaml"
-ALL_CHUNKS_PATH = "data/chunks/all_chunks.json"
+ALL_CHUNKS_PATH = "data/chunks/all_chunks.ndjson"
 
 def load_yaml(path):
     if os.path.exists(path):
@@ -48,15 +48,12 @@ def save_yaml(data, path):
         yaml.dump(data, f, sort_keys=False)
 
 #change
-def load_all_chunks():
-    if not os.path.exists(ALL_CHUNKS_PATH):
-        return []
-    with open(ALL_CHUNKS_PATH, "r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return []
-        
+def have_chunks():
+    # chunks are streamed to NDJSON by the chunker; iterate lazily via
+    # embed_module.iter_chunks instead of loading the whole corpus.
+    return os.path.exists(ALL_CHUNKS_PATH) and os.path.getsize(ALL_CHUNKS_PATH) > 0
+
+
 
 def run_pipeline():
     logging.info("Starting full pipeline...")
@@ -104,9 +101,8 @@ def run_pipeline():
     # ----------------------------
     # Embed
     # ----------------------------
-     # Load chunks produced by chunker
-    all_chunks = load_all_chunks()
-    if not all_chunks:
+     # Chunks produced by chunker (streamed NDJSON)
+    if not have_chunks():
         logging.warning("No chunks found; skipping embedding stage.")
     else:
         # ----------------------------
@@ -115,23 +111,25 @@ def run_pipeline():
         already_embedded = load_yaml(ALREADY_EMBEDDED_PATH) or {}
         try:
             # Try to load an existing persisted index + metadata
-            index, metadata_list = embed_module.load_index()
-            if index is None or not metadata_list:
+            index, metadata = embed_module.load_index()
+            if index is None or embed_module.metadata_len(metadata) == 0:
                 # No persisted DB found -> embed all chunks and save
                 logging.info("No persisted vector DB found. Embedding all chunks.")
-                index, metadata_list = embed_module.embed_all_and_save(all_chunks)
+                index, metadata = embed_module.embed_all_and_save(embed_module.iter_chunks(ALL_CHUNKS_PATH))
             else:
                 # Persisted DB found -> detect new chunks by chunk 'id' and embed only those
-                existing_ids = {m.get("id") for m in metadata_list if m.get("id") is not None}
-                new_chunks = [c for c in all_chunks if c.get("id") not in existing_ids]
+                existing_ids = set(metadata["ids"])
+                new_chunks = [c for c in embed_module.iter_chunks(ALL_CHUNKS_PATH) if c.get("id") not in existing_ids]
                 if not new_chunks:
                     logging.info("No new chunks to embed.")
                 else:
                     logging.info(f"Found {len(new_chunks)} new chunks. Embedding incrementally.")
-                    index, metadata_list = embed_module.add_embeddings_incremental(index, metadata_list, new_chunks)
+                    index, metadata = embed_module.add_embeddings_incremental(index, metadata, new_chunks)
+                    # persist adds still buffered by the batched saver
+                    embed_module.flush_index(index, metadata)
 
             # Update already_embedded tracker (simple count)
-            already_embedded = {"count": len(metadata_list)}
+            already_embedded = {"count": embed_module.metadata_len(metadata)}
             save_yaml(already_embedded, ALREADY_EMBEDDED_PATH)
             logging.info("Embedding stage completed and persisted.")
         except Exception as e:
@@ -1,11 +1,29 @@
 # src/preprocess.py
 
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import pdfplumber
 from docx import Document
 from bs4 import BeautifulSoup
 
+# selectolax's lexbor parser is ~10x faster than BeautifulSoup+lxml at HTML
+# text extraction; BeautifulSoup stays as the fallback when it's missing.
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+# PyMuPDF is C-backed and ~10-20x faster than pdfplumber at plain text
+# extraction; pdfplumber stays as the fallback for PDFs it cannot open.
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # older PyMuPDF releases
+    except ImportError:
+        pymupdf = None
+
 RAW_DIR = Path("data/raw")
 CLEAN_DIR = Path("data/clean")
 CLEAN_DIR.mkdir(parents=True, exist_ok=True)
@@ -14,6 +32,13 @@ CLEAN_DIR.mkdir(parents=True, exist_ok=True)
 # Extract text from PDF
 # ----------------------------
 def extract_pdf(path):
+    if pymupdf is not None:
+        try:
+            with pymupdf.open(path) as doc:
+                return "\n".join(page.get_text("text") for page in doc)
+        except Exception as e:
+            print(f"PyMuPDF failed on {path} ({e}); falling back to pdfplumber")
+
     text = ""
     try:
         with pdfplumber.open(path) as pdf:
@@ -46,7 +71,13 @@ def extract_html(path):
     text = ""
     try:
         with open(path, "r", encoding="utf-8") as f:
-            soup = BeautifulSoup(f, "lxml")
+            content = f.read()
+        if HTMLParser is not None:
+            tree = HTMLParser(content)
+            tree.strip_tags(["script", "style"])
+            text = tree.text(separator="\n")
+        else:
+            soup = BeautifulSoup(content, "lxml")
             for script in soup(["script", "style"]):
                 script.decompose()
             text = soup.get_text(separator="\n")
@@ -62,34 +93,48 @@ def clean_text(text):
     return "\n".join(lines)
 
 # ----------------------------
-# Main preprocessing function
+# Per-file worker
 # ----------------------------
-def main():
-    for site_folder in RAW_DIR.iterdir():
-        if not site_folder.is_dir():
-            continue
-        clean_site_folder = CLEAN_DIR / site_folder.name
-        clean_site_folder.mkdir(exist_ok=True, parents=True)
+def _process_file(site, file_path):
+    """
+    Extract and clean one PDF, writing the result to the site's clean folder.
+    Independent per-file work, so it can run in a worker process.
+    """
+    file_path = Path(file_path)
+    text = extract_pdf(file_path)
+    text = clean_text(text)
 
-        for file_path in site_folder.iterdir():
-            if not file_path.is_file():
-                continue
+    if text:
+        out_file = CLEAN_DIR / site / (file_path.stem + ".txt")
+        with open(out_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Processed {file_path} → {out_file}")
 
-            ext = file_path.suffix.lower()
-
-            # Only process PDFs for govt circulars, skip others if you want
-            if ext != ".pdf":
-                print(f"Skipping non-PDF file {file_path}")
-                continue
-
-            text = extract_pdf(file_path)
-            text = clean_text(text)
+# ----------------------------
+# Main preprocessing function
+# ----------------------------
+def main():
+    # One scandir-backed rglob walk instead of nested iterdir loops with a
+    # per-entry suffix check. Only PDFs are processed for govt circulars;
+    # rglob is case-sensitive, so match .PDF with a second pattern.
+    tasks = []
+    for pattern in ("*.pdf", "*.PDF"):
+        for file_path in RAW_DIR.rglob(pattern):
+            if file_path.parent == RAW_DIR:
+                continue  # only site subfolders hold raw documents
+            site = file_path.parent.name
+            (CLEAN_DIR / site).mkdir(exist_ok=True, parents=True)
+            tasks.append((site, file_path))
 
-            if text:
-                out_file = clean_site_folder / (file_path.stem + ".txt")
-                with open(out_file, "w", encoding="utf-8") as f:
-                    f.write(text)
-                print(f"Processed {file_path} → {out_file}")
+    # PDF extraction is the biggest wall-clock item in the pipeline and each
+    # file is independent, so fan out across all cores.
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+        futures = [pool.submit(_process_file, site, file_path) for site, file_path in tasks]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Preprocessing worker failed: {e}")
 
 if __name__ == "__main__":
     main()